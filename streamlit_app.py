@@ -1,18 +1,61 @@
-# app.py
+# streamlit_app.py
 import streamlit as st
 from pathlib import Path
 from dotenv import load_dotenv
-import os, math
+from PIL import Image, ImageOps
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+import os, re, math, time, hashlib, hmac, functools, queue, threading, logging, unicodedata, tempfile
 
 # ---------------------------
 # Config
 # ---------------------------
-load_dotenv()
+log = logging.getLogger(__name__)
 
 VAULTS_FOLDER = Path("vaults")
-VAULTS_FOLDER.mkdir(exist_ok=True)
 
-MASTER_ADMIN_KEY = os.getenv("MASTER_ADMIN_KEY", "YOUR_MASTER_KEY")
+@st.cache_resource
+def _load_config():
+    # .env parsing and the vaults/ mkdir only need to happen once per process,
+    # not on every script rerun
+    load_dotenv()
+    VAULTS_FOLDER.mkdir(exist_ok=True)
+    return os.getenv("MASTER_ADMIN_KEY", "YOUR_MASTER_KEY")
+
+MASTER_ADMIN_KEY = _load_config()
+_MASTER_ADMIN_KEY_B = MASTER_ADMIN_KEY.encode()
+
+# How long a directory listing is reused before the vault folder is re-read
+LIST_CACHE_TTL = 5.0
+
+# Files the gallery treats as images (lowercase, matched with str.endswith)
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".gif", ".webp")
+# The same set, in the form st.file_uploader expects
+UPLOAD_TYPES = tuple(ext[1:] for ext in IMAGE_EXTS)
+
+# Uploads are written to disk in chunks of this size
+UPLOAD_CHUNK = 1 << 20
+
+# Originals at least this large are dropped from the page cache once their
+# thumbnail exists, so big uploads don't evict the thumbnails the gallery reads
+FADVISE_MIN_BYTES = 8 << 20
+
+# Gallery tiles show a small WebP copy instead of the original upload
+THUMB_SIZE = (320, 320)
+# Part of every thumbnail's file name; bump it when make_thumbnail's output
+# changes so existing thumbnails are regenerated instead of reused
+THUMB_VERSION = 2
+
+# scrypt cost parameters for stored passkeys
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2**14, 8, 1
+
+# Names typed into the app (new vaults, rename targets): no path separators, no
+# leading dot (hidden/".." entries), space or dash. Checked after NFC normalization, so accents typed
+# as letter + combining mark count as letters.
+_SAFE_NAME = re.compile(r"^(?![.\s-])[\w .()\[\]&'’‘,+!#@=~-]{1,128}\Z")
+
+# Tiles rendered per gallery page
+GALLERY_PAGE_SIZE = 12
 
 # ---------------------------
 # Session state defaults
@@ -22,7 +65,10 @@ defaults = {
     "is_admin_internal": False,
     "member_key": None,
     "page": "home",
-    "action": None
+    "action": None,
+    "view_full": None,
+    "gallery_page_idx": 0,
+    "editing": None
 }
 for k, v in defaults.items():
     st.session_state.setdefault(k, v)
@@ -33,41 +79,410 @@ for k, v in defaults.items():
 def go_home():
     for k in ["vault_name", "is_admin_internal", "member_key", "page", "action"]:
         st.session_state[k] = None if k != "page" else "home"
+    st.session_state.action = "home"
+    # gallery position and tile state belong to the vault being left
+    st.session_state.gallery_page_idx = 0
+    st.session_state.view_full = None
+    st.session_state.editing = None
 
+def go_to(page):
+    st.session_state.page = page
+    st.session_state.action = page
+
+@functools.lru_cache(maxsize=256)
 def vault_path(name: str):
-    path = VAULTS_FOLDER / name
+    # pure path join, no filesystem access, so safe to memoize
+    return VAULTS_FOLDER / name
+
+def is_safe_name(name: str) -> bool:
+    # rules for names the user types in (new vaults, rename targets)
+    return bool(_SAFE_NAME.match(unicodedata.normalize("NFC", name)))
+
+def is_reachable_name(name: str) -> bool:
+    # names that already exist, or come from an upload, only need to stay
+    # inside their folder and off the dot-files (.vault_pass, .thumbs); song
+    # sheets use en dashes, colons, quotes and the like freely
+    return bool(name) and not name.startswith(".") and not any(c in name for c in "/\\\0")
+
+def vault_path_ensure(name: str):
+    if not is_safe_name(name):
+        raise ValueError(f"Invalid vault name: {name!r}")
+    path = vault_path(name)
     path.mkdir(exist_ok=True)
     return path
 
-def list_files(vault_name):
-    path = vault_path(vault_name)
-    return sorted(
-        [f.name for f in path.iterdir() if f.is_file() and not f.name.startswith(".")],
-        key=lambda s: s.lower(),
-    )
+@st.cache_resource
+def _list_cache():
+    # vault name -> {exts: (dir mtime_ns, cached_at, names, bases)}; survives script reruns
+    return {}
+
+def invalidate_listing(vault_name):
+    _list_cache().pop(vault_name, None)
 
-def save_file(vault_name, uploaded_file):
+def list_files_indexed(vault_name, exts=None):
+    # returns (names, bases): bases[i] is names[i] casefolded without extension.
+    # exts, if given, is a tuple of lowercase suffixes to keep.
+    path = vault_path(vault_name)
+    mtime_ns = path.stat().st_mtime_ns
+    now = time.monotonic()
+    cache = _list_cache().setdefault(vault_name, {})
+    cached = cache.get(exts)
+    if cached and cached[0] == mtime_ns and now - cached[1] < LIST_CACHE_TTL:
+        return cached[2], cached[3]
+
+    # scandir reuses the d_type from the directory read, so no stat per entry
+    with os.scandir(path) as it:
+        names = [
+            e.name for e in it
+            if not e.name.startswith(".")
+            and (exts is None or e.name.lower().endswith(exts))
+            and e.is_file(follow_symlinks=False)
+        ]
+    names.sort(key=str.casefold)
+    bases = [os.path.splitext(n)[0].casefold() for n in names]
+    cache[exts] = (mtime_ns, now, names, bases)
+    return names, bases
+
+def thumbnail_path(vault_name, fname):
+    return vault_path(vault_name) / ".thumbs" / f"{fname}.v{THUMB_VERSION}.webp"
+
+def _drop_page_cache(path):
+    if not hasattr(os, "posix_fadvise"):
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+def _webp_compatible(img):
+    # WebP only takes RGB/RGBA. 16/32-bit greyscale is stretched from its own
+    # min..max onto 0..255 rather than clipped at 255
+    if img.mode in ("RGB", "RGBA"):
+        return img
+    if img.mode.startswith("I"):
+        img = img.convert("I")
+        lo, hi = img.getextrema()
+        if lo < 0 or hi > 255:
+            scale = 255 / max(hi - lo, 1)
+            img = img.point(lambda v: v * scale - lo * scale)
+        img = img.convert("L")
+    has_alpha = img.mode in ("LA", "PA", "RGBa", "La") or "transparency" in img.info
+    return img.convert("RGBA" if has_alpha else "RGB")
+
+def make_thumbnail(vault_name, fname):
+    src = vault_path(vault_name) / fname
+    thumb = thumbnail_path(vault_name, fname)
+    try:
+        if thumb.exists() and thumb.stat().st_mtime >= src.stat().st_mtime:
+            return thumb
+        thumb.parent.mkdir(exist_ok=True)
+        # write beside the final path and swap it in, so a render never sees
+        # a half-written thumbnail (and a crash never leaves one behind)
+        tmp = thumb.with_name(f"{thumb.name}.{os.getpid()}.tmp")
+        try:
+            with Image.open(src) as img:
+                # WebP carries no EXIF, so apply the Orientation tag here or
+                # phone photos come out sideways
+                img = ImageOps.exif_transpose(img)
+                img.thumbnail(THUMB_SIZE, Image.Resampling.LANCZOS)
+                _webp_compatible(img).save(tmp, "WEBP", quality=80)
+            os.replace(tmp, thumb)
+        finally:
+            tmp.unlink(missing_ok=True)
+        if src.stat().st_size >= FADVISE_MIN_BYTES:
+            _drop_page_cache(src)
+        return thumb
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # unreadable, unsupported or oversized image: callers fall back to the
+        # original; never let it escape and kill the thumbnail worker
+        return None
+
+def _thumb_worker(jobs, status):
+    while True:
+        vault_name, fname, key = jobs.get()
+        ok = False
+        try:
+            ok = make_thumbnail(vault_name, fname) is not None
+        except Exception:
+            # this is the only worker; it must outlive any one bad file
+            log.exception("thumbnail failed for %s/%s", vault_name, fname)
+        finally:
+            if ok:
+                status.pop(key, None)
+            else:
+                status[key] = "failed"
+            jobs.task_done()
+
+@st.cache_resource
+def _thumb_jobs():
+    # one queue and one daemon worker per process, created on first use, plus
+    # (source path, source mtime_ns) -> "pending" | "failed" for queued versions
+    jobs, status = queue.Queue(), {}
+    threading.Thread(target=_thumb_worker, args=(jobs, status), daemon=True).start()
+    return jobs, status
+
+def queue_thumbnail(vault_name, fname, src_mtime_ns=None):
+    src = vault_path(vault_name) / fname
+    if src_mtime_ns is None:
+        try:
+            src_mtime_ns = src.stat().st_mtime_ns
+        except OSError:
+            return
+    key = (str(src), src_mtime_ns)
+    jobs, status = _thumb_jobs()
+    # one job per version of a file; a failed version is not retried until
+    # the file changes
+    if key in status:
+        return
+    status[key] = "pending"
+    jobs.put((vault_name, fname, key))
+
+def ready_thumbnail(vault_name, fname):
+    # thumbnail path if it is up to date; otherwise queue it and return None
+    src = vault_path(vault_name) / fname
+    thumb = thumbnail_path(vault_name, fname)
+    try:
+        src_st = src.stat()
+    except OSError:
+        return None
+    try:
+        if thumb.stat().st_mtime >= src_st.st_mtime:
+            return thumb
+    except OSError:
+        pass
+    queue_thumbnail(vault_name, fname, src_st.st_mtime_ns)
+    return None
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def load_thumb_bytes(path: str, mtime: float, size: int) -> bytes:
+    # mtime and size are part of the cache key so a replaced thumbnail is re-read
+    return Path(path).read_bytes()
+
+def _same_contents(path, uploaded_file):
+    # size first, so only same-sized files pay for hashing
+    try:
+        if path.stat().st_size != uploaded_file.size:
+            return False
+    except FileNotFoundError:
+        return False
+    with open(path, "rb") as f:
+        on_disk = hashlib.file_digest(f, "sha256").digest()
+    return on_disk == hashlib.sha256(uploaded_file.getbuffer()).digest()
+
+def _write_upload(vault_name, uploaded_file):
+    # pure file I/O, safe to run off the script thread; returns False when the
+    # vault already holds identical contents under this name
+    if not is_reachable_name(uploaded_file.name):
+        raise ValueError(f"Invalid file name: {uploaded_file.name!r}")
     path = vault_path(vault_name) / uploaded_file.name
-    with open(path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
+    if _same_contents(path, uploaded_file):
+        return False
+    # write chunked slices of the upload's own buffer: slicing a memoryview
+    # copies nothing, unlike read() which allocates a bytes per chunk
+    with uploaded_file.getbuffer() as buf, open(path, "wb") as f:
+        for i in range(0, len(buf), UPLOAD_CHUNK):
+            f.write(buf[i:i + UPLOAD_CHUNK])
+    return True
+
+def save_files(vault_name, uploaded_files, progress=None):
+    # progress: optional st.progress element, updated as each file lands
+    total = len(uploaded_files)
+    written = []
+    with ThreadPoolExecutor(max_workers=min(8, total)) as ex:
+        futures = {ex.submit(_write_upload, vault_name, f): f for f in uploaded_files}
+        for done, fut in enumerate(as_completed(futures), 1):
+            if fut.result():
+                written.append(futures[fut])
+            if progress is not None:
+                progress.progress(done / total, text=f"Saved {done} of {total}")
+    if written:
+        invalidate_listing(vault_name)
+    for f in written:
+        queue_thumbnail(vault_name, f.name)
 
 def rename_file(vault_name, old_name, new_name):
-    old_path = vault_path(vault_name) / old_name
-    new_path = vault_path(vault_name) / new_name
-    if old_path.exists():
-        # avoid overwriting a different existing file
-        if new_path.exists() and new_path.resolve() != old_path.resolve():
-            return False, "Target filename already exists."
-        old_path.rename(new_path)
-        return True, None
-    return False, "Original file not found."
+    if not is_safe_name(new_name):
+        return False, "Invalid filename."
+    vdir = vault_path(vault_name)
+    old_path = vdir / old_name
+    new_path = vdir / new_name
+    # avoid overwriting a different existing file
+    if new_path.exists() and new_path.resolve() != old_path.resolve():
+        return False, "Target filename already exists."
+    # single atomic rename syscall; a missing source surfaces as ENOENT
+    try:
+        os.replace(old_path, new_path)
+    except FileNotFoundError:
+        return False, "Original file not found."
+    try:
+        os.replace(thumbnail_path(vault_name, old_name), thumbnail_path(vault_name, new_name))
+    except FileNotFoundError:
+        pass
+    invalidate_listing(vault_name)
+    return True, None
 
 def delete_file(vault_name, filename):
     path = vault_path(vault_name) / filename
-    if path.exists():
+    try:
         path.unlink()
+    except FileNotFoundError:
+        return False
+    thumbnail_path(vault_name, filename).unlink(missing_ok=True)
+    invalidate_listing(vault_name)
+    return True
+
+def _scrypt(passkey: str, salt: bytes) -> bytes:
+    return hashlib.scrypt(passkey.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=32)
+
+def hash_passkey(passkey: str) -> str:
+    salt = os.urandom(16)
+    return f"scrypt${salt.hex()}${_scrypt(passkey, salt).hex()}"
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def _load_passkey(path: str, mtime_ns: int):
+    # (salt, digest) for hashed files; (None, plaintext) for vaults created before hashing
+    raw = Path(path).read_bytes()
+    if raw.startswith(b"scrypt$"):
+        _, salt, digest = raw.decode().split("$")
+        return bytes.fromhex(salt), bytes.fromhex(digest)
+    return None, raw
+
+def _upgrade_passkey(path, passkey: str):
+    # replace a plaintext passkey file with its hash once the key is known good
+    # sessions are threads of one process, so the temp name must be unique per
+    # call, not per pid, or two first logins could swap in each other's file
+    tmp = None
+    try:
+        fd, tmp = tempfile.mkstemp(prefix=f"{path.name}.", suffix=".tmp", dir=path.parent)
+        with os.fdopen(fd, "w") as f:
+            f.write(hash_passkey(passkey))
+        os.replace(tmp, path)
+    except OSError:
+        # a read-only vault still logs in; the upgrade is retried next time
+        log.exception("could not upgrade passkey file %s", path)
+    finally:
+        if tmp:
+            Path(tmp).unlink(missing_ok=True)
+
+def check_passkey(path, candidate: str) -> bool:
+    try:
+        salt, digest = _load_passkey(str(path), path.stat().st_mtime_ns)
+    except ValueError:
+        # malformed "scrypt$..." file: nothing can match it
+        log.warning("malformed passkey file %s", path)
+        return False
+    if salt is None:
+        if not hmac.compare_digest(candidate.encode(), digest):
+            return False
+        _upgrade_passkey(path, candidate)
         return True
-    return False
+    return hmac.compare_digest(_scrypt(candidate, salt), digest)
+
+def chunks(xs, n):
+    it = iter(xs)
+    return iter(lambda: list(islice(it, n)), [])
+
+def set_gallery_page(idx):
+    st.session_state.gallery_page_idx = idx
+
+# view_full/editing name one tile at a time; switching them away from another
+# tile has to redraw that tile too, which a fragment rerun would not do
+def _set_tile_state(name, fname):
+    previous = st.session_state[name]
+    if fname is not None and previous not in (None, fname):
+        st.session_state.gallery_dirty = True
+    st.session_state[name] = fname
+
+def set_view_full(fname):
+    _set_tile_state("view_full", fname)
+
+def set_editing(fname):
+    _set_tile_state("editing", fname)
+
+# Rename/delete run as button callbacks, i.e. before the rerun they trigger,
+# so the next render already sees the updated listing
+def rename_clicked(vault_name, fname, rename_key):
+    candidate = st.session_state[rename_key].strip()
+    if not candidate:
+        st.session_state.gallery_flash = ("error", "Name cannot be empty.")
+        return
+    # If user omitted extension, append original extension
+    if "." not in candidate:
+        candidate = candidate + os.path.splitext(fname)[1].lower()
+    success, err = rename_file(vault_name, fname, candidate)
+    if success:
+        # move the rename input to the new key so it shows the new name
+        st.session_state[f"rename_{candidate}"] = os.path.splitext(candidate)[0]
+        st.session_state.pop(rename_key, None)
+        st.session_state.editing = None
+        st.session_state.gallery_flash = ("success", "Renamed successfully.")
+        st.session_state.action = "refresh"
+    else:
+        st.session_state.gallery_flash = ("error", f"Rename failed: {err}")
+
+def delete_clicked(vault_name, fname):
+    if delete_file(vault_name, fname):
+        st.session_state.pop(f"rename_{fname}", None)
+        st.session_state.editing = None
+        st.session_state.gallery_flash = ("success", "Deleted.")
+        st.session_state.action = "refresh"
+    else:
+        st.session_state.gallery_flash = ("error", "Delete failed.")
+
+# Open/Create vault also run as callbacks, so the click's own rerun already
+# lands on the vault page; problems are left in login_flash/create_flash
+def _enter_vault(vault_name, role):
+    st.session_state.vault_name = vault_name
+    st.session_state.is_admin_internal = role != "MEMBER"
+    st.session_state.member_key = role
+    st.session_state.page = "vault"
+    st.session_state.action = "vault"
+
+def open_vault_clicked():
+    vault_name = st.session_state.login_vault_name
+    member_pass = st.session_state.login_vault_pass
+    admin_pass = st.session_state.login_vault_admin_pass
+    path = vault_path(vault_name)
+    vault_pass_file = path / ".vault_pass"
+    admin_pass_file = path / ".admin_pass"
+
+    # LOGIN LOGIC
+    if not is_reachable_name(vault_name):
+        st.session_state.login_flash = ("error", "Vault not found.")
+    # master key first: it needs the vault folder but none of its passkey files
+    elif hmac.compare_digest(member_pass.encode(), _MASTER_ADMIN_KEY_B):
+        if path.is_dir():
+            _enter_vault(vault_name, "MASTER_ADMIN")
+        else:
+            st.session_state.login_flash = ("error", "Vault not found.")
+    elif not vault_pass_file.exists():
+        st.session_state.login_flash = ("error", "Vault not found.")
+    elif admin_pass:
+        if not admin_pass_file.exists():
+            admin_pass_file = vault_pass_file
+        if check_passkey(admin_pass_file, admin_pass):
+            _enter_vault(vault_name, "VAULT_ADMIN")
+        else:
+            st.session_state.login_flash = ("error", "Incorrect admin passkey.")
+    elif check_passkey(vault_pass_file, member_pass):
+        _enter_vault(vault_name, "MEMBER")
+    else:
+        st.session_state.login_flash = ("error", "Incorrect password.")
+
+def create_vault_clicked():
+    new_name = st.session_state.new_vault_name
+    vault_pass_new = st.session_state.new_vault_pass
+    admin_pass_new = st.session_state.new_vault_admin_pass
+    if not new_name or not vault_pass_new or not admin_pass_new:
+        st.session_state.create_flash = ("warning", "Fill all fields")
+    elif not is_safe_name(new_name):
+        st.session_state.create_flash = ("error", "Vault name may only contain letters, digits, spaces and . ( ) [ ] & ' , + ! # @ = ~ - and may not start with a dot, space or dash")
+    else:
+        path = vault_path_ensure(new_name)
+        (path / ".vault_pass").write_text(hash_passkey(vault_pass_new))
+        (path / ".admin_pass").write_text(hash_passkey(admin_pass_new))
+        _enter_vault(new_name, "VAULT_ADMIN")
 
 # ---------------------------
 # Pages
@@ -77,121 +492,127 @@ def vault_page():
     st.header(f"📂 Vault — {vault_name}")
 
     c1, c2 = st.columns([1, 1])
-    if c1.button("⬅ Back to home"):
-        go_home()
-        st.session_state.action = "home"
-    if c2.button("📸 Open Gallery"):
-        st.session_state.page = "gallery"
-        st.session_state.action = "gallery"
+    # Navigation runs as callbacks so the click's own rerun lands on the new page
+    c1.button("⬅ Back to home", on_click=go_home)
+    c2.button("📸 Open Gallery", on_click=go_to, args=("gallery",))
 
     uploaded_files = st.file_uploader(
         "Upload images (lyrics, posters, etc.)",
         accept_multiple_files=True,
-        type=["png", "jpg", "jpeg", "webp", "gif"]
+        type=UPLOAD_TYPES
     )
     if uploaded_files:
-        for f in uploaded_files:
-            save_file(vault_name, f)
-        st.success("✅ Uploaded successfully!")
+        rejected = [f.name for f in uploaded_files if not is_reachable_name(f.name)]
+        accepted = [f for f in uploaded_files if is_reachable_name(f.name)]
+        if rejected:
+            st.error(f"Skipped files with invalid names: {', '.join(rejected)}")
+        if accepted:
+            save_files(vault_name, accepted, progress=st.progress(0.0))
+            st.success("✅ Uploaded successfully!")
+
+@st.fragment
+def gallery_tile(vault_name, fname):
+    # Clicks inside a tile rerun only this fragment. Rename/delete leave a flash
+    # message behind, since they change the listing, and switching view/edit
+    # away from another tile sets gallery_dirty; both escalate to a full rerun.
+    if "gallery_flash" in st.session_state or "gallery_dirty" in st.session_state:
+        st.rerun()
+
+    key_base = fname  # unique key per file (including extension)
+
+    original = vault_path(vault_name) / fname
+    # until the background worker has produced it, show the original
+    thumb = ready_thumbnail(vault_name, fname)
+    if thumb:
+        st_ = os.stat(thumb)
+        st.image(load_thumb_bytes(str(thumb), st_.st_mtime, st_.st_size), caption=fname)
+    else:
+        st.image(str(original), caption=fname)
+
+    # Full-size image is only sent for the tile the user asked for
+    if st.session_state.view_full == fname:
+        st.button("Hide full", key=f"btn_hide_{key_base}", on_click=set_view_full, args=(None,))
+        st.image(str(original))
+    else:
+        st.button("View full", key=f"btn_full_{key_base}", on_click=set_view_full, args=(fname,))
+
+    # Admin-only options; the edit widgets exist for one tile at a time
+    if st.session_state.is_admin_internal and st.session_state.editing != fname:
+        st.button("✏️ Edit", key=f"btn_edit_{key_base}", on_click=set_editing, args=(fname,))
+    elif st.session_state.is_admin_internal:
+        # Show rename input prefilled WITHOUT the extension (more natural)
+        rename_key = f"rename_{key_base}"
+        default_without_ext = os.path.splitext(fname)[0]
+        # initialize state value if not present to keep the displayed value consistent
+        if rename_key not in st.session_state:
+            st.session_state[rename_key] = default_without_ext
+
+        st.text_input("Rename to (no need to add extension)", key=rename_key)
+        st.button(
+            "Rename", key=f"btn_rn_{key_base}",
+            on_click=rename_clicked, args=(vault_name, fname, rename_key),
+        )
+        st.button(
+            "Delete", key=f"btn_del_{key_base}",
+            on_click=delete_clicked, args=(vault_name, fname),
+        )
+        st.button("Cancel", key=f"btn_cancel_{key_base}", on_click=set_editing, args=(None,))
 
 def gallery_page():
     vault_name = st.session_state.vault_name
     st.header(f"🖼️ Gallery — {vault_name}")
 
-    if st.button("⬅ Back to Vault"):
-        st.session_state.page = "vault"
-        st.session_state.action = "vault"
+    st.button("⬅ Back to Vault", on_click=go_to, args=("vault",))
 
-    # --- Search bar ---
-    search_query = st.text_input("🔍 Search lyrics or image name", placeholder="Type to search...").strip().lower()
+    st.session_state.pop("gallery_dirty", None)
+    flash = st.session_state.pop("gallery_flash", None)
+    if flash:
+        level, msg = flash
+        getattr(st, level)(msg)
 
-    files = list_files(vault_name)
-    # Only include common image extensions
-    image_exts = ("jpg", "jpeg", "png", "gif", "webp")
-    image_files = [f for f in files if f.split(".")[-1].lower() in image_exts]
+    # --- Search bar ---
+    # a new query starts from its first page of results
+    search_query = st.text_input(
+        "🔍 Search lyrics or image name", placeholder="Type to search...",
+        key="gallery_search", on_change=set_gallery_page, args=(0,),
+    ).strip().casefold()
 
-    # Helper: filename without extension
-    def name_without_ext(fn: str) -> str:
-        if "." in fn:
-            return ".".join(fn.split(".")[:-1])
-        return fn
+    # Only common image extensions, filtered while scanning the directory
+    names, bases = list_files_indexed(vault_name, IMAGE_EXTS)
 
-    # Filter files by search term (compare without extension)
+    # Filter files by search term (compare without extension); with no search
+    # term the cached listing is used as-is
     if search_query:
-        filtered = []
-        for f in image_files:
-            base = name_without_ext(f).lower()
-            if search_query in base:
-                filtered.append(f)
-        image_files = filtered
+        image_files = [n for n, b in zip(names, bases) if search_query in b]
+    else:
+        image_files = names
 
     if not image_files:
         st.info("No matching images found.")
         return
 
+    # Only one page of tiles is sent to the browser per rerun
+    page_count = math.ceil(len(image_files) / GALLERY_PAGE_SIZE)
+    page_idx = min(st.session_state.gallery_page_idx, page_count - 1)
+    st.session_state.gallery_page_idx = page_idx
+    start = page_idx * GALLERY_PAGE_SIZE
+    image_files = image_files[start:start + GALLERY_PAGE_SIZE]
+
     per_row = 3
-    rows = math.ceil(len(image_files) / per_row)
-    idx = 0
 
     # Show images in grid and allow admin actions
-    for _ in range(rows):
+    for row_files in chunks(image_files, per_row):
+        # always per_row columns so a short last row keeps the same tile width
         cols = st.columns(per_row, gap="large")
-        for c in range(per_row):
-            if idx >= len(image_files):
-                break
-            fname = image_files[idx]
-            ext = fname.split(".")[-1].lower()
-            key_base = fname  # unique key per file (including extension)
-
-            with cols[c]:
-                st.image(str(vault_path(vault_name) / fname), caption=fname)
-                st.markdown(f"**{fname}**")
-
-                # Admin-only options
-                if st.session_state.is_admin_internal:
-                    # Show rename input prefilled WITHOUT the extension (more natural)
-                    rename_key = f"rename_{key_base}"
-                    default_without_ext = name_without_ext(fname)
-                    # initialize state value if not present to keep the displayed value consistent
-                    if rename_key not in st.session_state:
-                        st.session_state[rename_key] = default_without_ext
-
-                    new_name_raw = st.text_input("Rename to (no need to add extension)", key=rename_key)
-                    if st.button("Rename", key=f"btn_rn_{key_base}"):
-                        # If user omitted extension, append original extension
-                        candidate = new_name_raw.strip()
-                        if not candidate:
-                            st.error("Name cannot be empty.")
-                        else:
-                            if "." not in candidate:
-                                candidate = f"{candidate}.{ext}"
-                            success, err = rename_file(vault_name, fname, candidate)
-                            if success:
-                                st.success("Renamed successfully.")
-                                # update session state keys to reflect new filename
-                                # move the rename input to new key to avoid duplicate keys next render
-                                new_key = f"rename_{candidate}"
-                                st.session_state[new_key] = name_without_ext(candidate)
-                                # remove old key if exists
-                                if rename_key in st.session_state:
-                                    try:
-                                        del st.session_state[rename_key]
-                                    except Exception:
-                                        pass
-                                st.session_state.action = "refresh"
-                                st.experimental_rerun()
-                            else:
-                                st.error(f"Rename failed: {err}")
-
-                    if st.button("Delete", key=f"btn_del_{key_base}"):
-                        if delete_file(vault_name, fname):
-                            st.success("Deleted.")
-                            st.session_state.action = "refresh"
-                            st.experimental_rerun()
-                        else:
-                            st.error("Delete failed.")
-
-            idx += 1
+        for col, fname in zip(cols, row_files):
+            with col:
+                gallery_tile(vault_name, fname)
+
+    if page_count > 1:
+        p1, p2, p3 = st.columns([1, 2, 1])
+        p1.button("⬅ Prev", disabled=page_idx == 0, on_click=set_gallery_page, args=(page_idx - 1,))
+        p2.markdown(f"Page {page_idx + 1} of {page_count}")
+        p3.button("Next ➡", disabled=page_idx >= page_count - 1, on_click=set_gallery_page, args=(page_idx + 1,))
 
 def home_page():
     st.title("🙏 Worship Vault")
@@ -200,64 +621,27 @@ def home_page():
     c1, c2 = st.columns(2)
     with c1:
         st.subheader("Enter existing vault")
-        vault_name = st.text_input("Vault name", key="login_vault_name")
-        member_pass = st.text_input("Vault password (member)", type="password", key="login_vault_pass")
-        admin_pass = st.text_input("Vault admin passkey", type="password", key="login_vault_admin_pass")
-
-        if st.button("Open vault"):
-            path = vault_path(vault_name)
-            vault_pass_file = path / ".vault_pass"
-            admin_pass_file = path / ".admin_pass"
+        st.text_input("Vault name", key="login_vault_name")
+        st.text_input("Vault password (member)", type="password", key="login_vault_pass")
+        st.text_input("Vault admin passkey", type="password", key="login_vault_admin_pass")
 
-            if not path.exists() or not vault_pass_file.exists():
-                st.error("Vault not found.")
-            else:
-                vault_member_pass = vault_pass_file.read_text()
-                vault_admin_pass = admin_pass_file.read_text() if admin_pass_file.exists() else vault_member_pass
-
-                # LOGIN LOGIC
-                if member_pass == MASTER_ADMIN_KEY:
-                    st.session_state.vault_name = vault_name
-                    st.session_state.is_admin_internal = True
-                    st.session_state.member_key = "MASTER_ADMIN"
-                elif admin_pass:
-                    if admin_pass == vault_admin_pass:
-                        st.session_state.vault_name = vault_name
-                        st.session_state.is_admin_internal = True
-                        st.session_state.member_key = "VAULT_ADMIN"
-                    else:
-                        st.error("Incorrect admin passkey.")
-                        st.stop()
-                elif member_pass == vault_member_pass:
-                    st.session_state.vault_name = vault_name
-                    st.session_state.is_admin_internal = False
-                    st.session_state.member_key = "MEMBER"
-                else:
-                    st.error("Incorrect password.")
-                    st.stop()
-
-                st.session_state.page = "vault"
-                st.session_state.action = "vault"
+        st.button("Open vault", on_click=open_vault_clicked)
+        flash = st.session_state.pop("login_flash", None)
+        if flash:
+            level, msg = flash
+            getattr(st, level)(msg)
 
     with c2:
         st.subheader("Create new vault")
-        new_name = st.text_input("Vault name", key="new_vault_name")
-        vault_pass_new = st.text_input("Vault passkey (member)", type="password", key="new_vault_pass")
-        admin_pass_new = st.text_input("Vault admin passkey", type="password", key="new_vault_admin_pass")
-
-        if st.button("Create vault"):
-            if not new_name or not vault_pass_new or not admin_pass_new:
-                st.warning("Fill all fields")
-            else:
-                path = vault_path(new_name)
-                (path / ".vault_pass").write_text(vault_pass_new)
-                (path / ".admin_pass").write_text(admin_pass_new)
-
-                st.session_state.vault_name = new_name
-                st.session_state.is_admin_internal = True
-                st.session_state.member_key = "VAULT_ADMIN"
-                st.session_state.page = "vault"
-                st.session_state.action = "vault"
+        st.text_input("Vault name", key="new_vault_name")
+        st.text_input("Vault passkey (member)", type="password", key="new_vault_pass")
+        st.text_input("Vault admin passkey", type="password", key="new_vault_admin_pass")
+
+        st.button("Create vault", on_click=create_vault_clicked)
+        flash = st.session_state.pop("create_flash", None)
+        if flash:
+            level, msg = flash
+            getattr(st, level)(msg)
 
 # ---------------------------
 # Routing